@@ -1,21 +1,93 @@
 import streamlit as st
+import os
 import sqlite3
+import tempfile
+import itertools
+import threading
+from contextlib import contextmanager
 from datetime import date
 import pandas as pd
-from contextlib import closing
 
 DB_PATH = st.secrets.get("DB_PATH", "leave_mgmt.sqlite3")
 
 st.set_page_config(page_title="Leave Management System", page_icon="🗓️", layout="wide")
 
 # ---------------------- DB helpers ----------------------
-def get_conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+READ_POOL_SIZE = 4
+# Prepared statements are cached per connection, keyed by SQL text; the pooled
+# connections are long-lived, so keep more of them than the default of 128.
+STATEMENT_CACHE_SIZE = 256
+FETCH_CHUNK_SIZE = 4096
+# Bound the listing caches; every search string / filter combination is an entry.
+LISTING_CACHE_ENTRIES = 64
+# The FTS5 trigram tokenizer used for employee search needs SQLite 3.34+.
+FTS_TRIGRAM_MIN_VERSION = (3, 34, 0)
+# Dates are also stored as INTEGER day numbers (date.toordinal()) in the *_d columns
+# so range checks and day counts are plain integer comparisons and arithmetic.
+# julianday() of an ISO date minus this offset gives the same ordinal.
+ORDINAL_JULIAN_OFFSET = 1721424.5
+# Inclusive day count of a leave request, computed by SQLite instead of per row in Python.
+DAYS_EXPR = "end_d - start_d + 1"
+# Columns shown in the UI tables; reason is only fetched where it is displayed.
+EMPLOYEE_COLUMNS = "id, name, email, department, joining_date, leave_balance"
+LEAVE_COLUMNS = f"id, employee_id, start_date, end_date, status, created_at, {DAYS_EXPR} AS days"
+EMPLOYEE_DTYPES = {"joining_date": "datetime64[ns]"}
+LEAVE_DTYPES = {"start_date": "datetime64[ns]", "end_date": "datetime64[ns]", "created_at": "datetime64[ns]"}
+
+def _open_conn(query_only: bool = False):
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute("PRAGMA busy_timeout = 5000;")
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    conn.execute("PRAGMA cache_size = -20000;")
+    if query_only:
+        conn.execute("PRAGMA query_only = ON;")
+    return conn
+
+@st.cache_resource
+def get_conn():
+    # Single long-lived connection shared across reruns; used for writes.
+    conn = _open_conn()
+    # journal_mode is persistent on the DB file, so setting it once per process
+    # is enough; in-memory databases cannot use WAL.
+    if DB_PATH != ":memory:":
+        conn.execute("PRAGMA journal_mode = WAL;")
     return conn
 
+@st.cache_resource
+def _write_lock():
+    # SQLite allows a single writer even under WAL; serialising writers here avoids
+    # SQLITE_BUSY errors and interleaved transactions on the shared connection.
+    # Cached like the connection, since the script module is rebuilt on every rerun.
+    return threading.Lock()
+
+@contextmanager
+def write_tx():
+    with _write_lock():
+        conn = get_conn()
+        with conn:
+            yield conn
+
+@st.cache_resource
+def _read_pool():
+    conns = [_open_conn(query_only=True) for _ in range(READ_POOL_SIZE)]
+    return itertools.cycle(conns), threading.Lock()
+
+def get_read_conn():
+    # Each in-memory connection is its own database, so reads must share the writer.
+    if DB_PATH == ":memory:":
+        return get_conn()
+    pool, lock = _read_pool()
+    with lock:
+        return next(pool)
+
 def init_db():
-    with closing(get_conn()) as conn, conn:
+    with write_tx() as conn:
+        has_fts = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'employees_fts'"
+        ).fetchone() is not None
         conn.executescript(
             """
             CREATE TABLE IF NOT EXISTS employees (
@@ -39,40 +111,191 @@ def init_db():
                 FOREIGN KEY(employee_id) REFERENCES employees(id) ON DELETE CASCADE
             );
 
-            CREATE INDEX IF NOT EXISTS idx_leave_emp ON leave_requests(employee_id);
-            CREATE INDEX IF NOT EXISTS idx_leave_status ON leave_requests(status);
+            -- Prefixes of idx_leave_emp_status_range_d and idx_leave_status_created.
+            DROP INDEX IF EXISTS idx_leave_emp;
+            DROP INDEX IF EXISTS idx_leave_status;
+            DROP INDEX IF EXISTS idx_leave_emp_status_range;
+            CREATE INDEX IF NOT EXISTS idx_leave_status_created ON leave_requests(status, created_at DESC);
+            DROP INDEX IF EXISTS idx_emp_lname;
+            DROP INDEX IF EXISTS idx_emp_lemail;
             """
         )
+        if sqlite3.sqlite_version_info >= FTS_TRIGRAM_MIN_VERSION:
+            try:
+                _create_employees_fts(conn, rebuild=not has_fts)
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5; list_employees() falls back to LIKE.
+                pass
+        _migrate_day_columns(conn)
+
+def _create_employees_fts(conn, rebuild: bool):
+    conn.executescript(
+        """
+        -- Trigram full-text index over name/email for substring search.
+        CREATE VIRTUAL TABLE IF NOT EXISTS employees_fts USING fts5(
+            name, email, content='employees', content_rowid='id', tokenize='trigram'
+        );
+        CREATE TRIGGER IF NOT EXISTS employees_fts_ai AFTER INSERT ON employees BEGIN
+            INSERT INTO employees_fts(rowid, name, email) VALUES (new.id, new.name, new.email);
+        END;
+        CREATE TRIGGER IF NOT EXISTS employees_fts_ad AFTER DELETE ON employees BEGIN
+            INSERT INTO employees_fts(employees_fts, rowid, name, email) VALUES ('delete', old.id, old.name, old.email);
+        END;
+        CREATE TRIGGER IF NOT EXISTS employees_fts_au AFTER UPDATE OF name, email ON employees BEGIN
+            INSERT INTO employees_fts(employees_fts, rowid, name, email) VALUES ('delete', old.id, old.name, old.email);
+            INSERT INTO employees_fts(rowid, name, email) VALUES (new.id, new.name, new.email);
+        END;
+        """
+    )
+    if rebuild:
+        # Index employees that existed before the FTS table was added.
+        conn.execute("INSERT INTO employees_fts(employees_fts) VALUES ('rebuild')")
+
+@st.cache_resource
+def fts_available() -> bool:
+    row = get_read_conn().execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'employees_fts'"
+    ).fetchone()
+    return row is not None
+
+def _migrate_day_columns(conn):
+    day_columns = {
+        "employees": [("joining_d", "joining_date")],
+        "leave_requests": [("start_d", "start_date"), ("end_d", "end_date")],
+    }
+    for table, cols in day_columns.items():
+        existing = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+        for int_col, text_col in cols:
+            if int_col in existing:
+                continue
+            # Backfill only when the column is new; writers fill it from then on.
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {int_col} INTEGER")
+            conn.execute(
+                f"UPDATE {table} SET {int_col} = CAST(julianday({text_col}) - ? AS INTEGER)",
+                (ORDINAL_JULIAN_OFFSET,)
+            )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_leave_emp_status_range_d ON leave_requests(employee_id, status, start_d, end_d)"
+    )
+
+@st.cache_resource
+def ensure_schema():
+    # Schema creation and migrations only need to run once per process, not on
+    # every rerun; the Admin tab can still call init_db() directly.
+    init_db()
 
 def days_inclusive(start: date, end: date) -> int:
     return (end - start).days + 1
 
-def list_employees(q: str | None = None) -> pd.DataFrame:
-    with closing(get_conn()) as conn:
-        if q:
-            df = pd.read_sql_query(
-                "SELECT * FROM employees WHERE LOWER(name) LIKE ? OR LOWER(email) LIKE ? ORDER BY id DESC",
-                conn, params=[f"%{q.lower()}%", f"%{q.lower()}%"]
-            )
-        else:
-            df = pd.read_sql_query("SELECT * FROM employees ORDER BY id DESC", conn)
+def fetch_df(conn, sql: str, params=(), dtypes: dict | None = None, chunked: bool = False) -> pd.DataFrame:
+    # Result sets here are small, so build the frame straight from fetchall()
+    # instead of going through pd.read_sql_query. Unfiltered listings pass
+    # chunked=True so only FETCH_CHUNK_SIZE raw rows are held at a time.
+    cur = conn.cursor()
+    # Plain tuples are all DataFrame.from_records needs.
+    cur.row_factory = None
+    cur.execute(sql, params)
+    cols = [c[0] for c in cur.description]
+
+    def to_frame(rows):
+        df = pd.DataFrame.from_records(rows, columns=cols)
+        return df.astype(dtypes) if dtypes else df
+
+    if not chunked:
+        return to_frame(cur.fetchall())
+    frames = [to_frame(rows) for rows in iter(lambda: cur.fetchmany(FETCH_CHUNK_SIZE), [])]
+    return pd.concat(frames, ignore_index=True) if frames else to_frame([])
+
+@st.cache_resource
+def _db_state() -> dict:
+    # Process-wide, so every session keys its cached reads on the same DB state.
+    return {"ver": 0}
+
+def db_version() -> int:
+    return _db_state()["ver"]
+
+def bump_db_version():
+    # Called after every write commits; bumping the shared version makes every
+    # session miss its cached reads, even ones computed while the write ran.
+    state = _db_state()
+    with _write_lock():
+        state["ver"] += 1
+    list_employees.clear()
+    list_leaves.clear()
+    _get_employee_cached.clear()
+    _get_balance_cached.clear()
+
+@st.cache_data(show_spinner=False, max_entries=LISTING_CACHE_ENTRIES)
+def list_employees(q: str | None = None, ver: int = 0) -> pd.DataFrame:
+    conn = get_read_conn()
+    if q and len(q) >= 3 and fts_available():
+        # Trigram MATCH needs at least three characters; quote q as a single phrase.
+        df = fetch_df(
+            conn,
+            f"SELECT {EMPLOYEE_COLUMNS} FROM employees "
+            "WHERE id IN (SELECT rowid FROM employees_fts WHERE employees_fts MATCH ?) ORDER BY id DESC",
+            ['"' + q.replace('"', '""') + '"'], EMPLOYEE_DTYPES
+        )
+    elif q:
+        df = fetch_df(
+            conn,
+            f"SELECT {EMPLOYEE_COLUMNS} FROM employees WHERE LOWER(name) LIKE ? OR LOWER(email) LIKE ? ORDER BY id DESC",
+            [f"%{q.lower()}%", f"%{q.lower()}%"], EMPLOYEE_DTYPES
+        )
+    else:
+        df = fetch_df(
+            conn, f"SELECT {EMPLOYEE_COLUMNS} FROM employees ORDER BY id DESC", dtypes=EMPLOYEE_DTYPES, chunked=True
+        )
     return df
 
+@st.cache_data(show_spinner=False, max_entries=512)
+def _get_employee_cached(emp_id: int, ver: int):
+    conn = get_read_conn()
+    row = conn.execute("SELECT * FROM employees WHERE id = ?", (emp_id,)).fetchone()
+    return dict(row) if row else None
+
 def get_employee(emp_id: int):
-    with closing(get_conn()) as conn:
-        cur = conn.execute("SELECT * FROM employees WHERE id = ?", (emp_id,))
-        row = cur.fetchone()
-        if not row:
-            return None
-        cols = [c[0] for c in cur.description]
-        return dict(zip(cols, row))
+    return _get_employee_cached(emp_id, db_version())
 
 def add_employee(name, email, department, joining_date, leave_balance=24):
-    with closing(get_conn()) as conn, conn:
+    with write_tx() as conn:
         conn.execute(
-            "INSERT INTO employees (name, email, department, joining_date, leave_balance) VALUES (?, ?, ?, ?, ?)",
-            (name, email, department, joining_date.isoformat(), int(leave_balance))
+            "INSERT INTO employees (name, email, department, joining_date, joining_d, leave_balance) VALUES (?, ?, ?, ?, ?, ?)",
+            (name, email, department, joining_date.isoformat(), joining_date.toordinal(), int(leave_balance))
+        )
+    bump_db_version()
+
+def import_employees(df: pd.DataFrame) -> int:
+    required = ["name", "email", "department", "joining_date"]
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    rows = df[required].copy()
+    for col in ["name", "email", "department"]:
+        rows[col] = rows[col].astype("string").str.strip()
+        if (rows[col].isna() | (rows[col] == "")).any():
+            raise ValueError(f"Column '{col}' has empty values")
+    joining = pd.to_datetime(rows["joining_date"], format="%Y-%m-%d")
+    if joining.isna().any():
+        raise ValueError("Column 'joining_date' has empty values")
+    rows["joining_date"] = joining.dt.strftime("%Y-%m-%d")
+    rows["joining_d"] = joining.dt.date.map(date.toordinal)
+    if "leave_balance" in df.columns:
+        balance = pd.to_numeric(df["leave_balance"], errors="coerce").where(df["leave_balance"].notna(), 24)
+        # Same bounds as the Add Employee form: whole days between 0 and 365.
+        if (balance.isna() | (balance % 1 != 0) | (balance < 0) | (balance > 365)).any():
+            raise ValueError("leave_balance must be a whole number between 0 and 365")
+        rows["leave_balance"] = balance.astype(int)
+    else:
+        rows["leave_balance"] = 24
+    # One executemany in one transaction; a bad row rolls back the whole import.
+    with write_tx() as conn:
+        conn.executemany(
+            "INSERT INTO employees (name, email, department, joining_date, joining_d, leave_balance) VALUES (?, ?, ?, ?, ?, ?)",
+            rows.itertuples(index=False, name=None)
         )
+    bump_db_version()
+    return len(rows)
 
 def has_overlap(conn, employee_id: int, start_date: date, end_date: date) -> bool:
     cur = conn.execute(
@@ -80,112 +303,168 @@ def has_overlap(conn, employee_id: int, start_date: date, end_date: date) -> boo
         SELECT 1 FROM leave_requests
         WHERE employee_id = ?
           AND status IN ('PENDING','APPROVED')
-          AND start_date <= ?
-          AND end_date >= ?
+          AND start_d <= ?
+          AND end_d >= ?
         LIMIT 1
         """,
-        (employee_id, end_date.isoformat(), start_date.isoformat())
+        (employee_id, end_date.toordinal(), start_date.toordinal())
     )
     return cur.fetchone() is not None
 
 def apply_leave(employee_id: int, start_date: date, end_date: date, reason: str | None):
-    with closing(get_conn()) as conn, conn:
-        emp_cur = conn.execute("SELECT joining_date, leave_balance FROM employees WHERE id = ?", (employee_id,))
-        emp = emp_cur.fetchone()
-        if not emp:
-            raise ValueError("Employee not found")
-        joining_date = date.fromisoformat(emp[0])
-        balance = int(emp[1])
-
-        if end_date < start_date:
-            raise ValueError("End date cannot be before start date")
-        if start_date < joining_date:
-            raise ValueError("Cannot apply for leave before joining date")
-
-        if has_overlap(conn, employee_id, start_date, end_date):
-            raise ValueError("Overlapping leave request exists (pending or approved)")
-
-        req_days = days_inclusive(start_date, end_date)
-        if req_days <= 0:
-            raise ValueError("Invalid duration")
-        if req_days > balance:
-            raise ValueError("Insufficient leave balance")
-
-        conn.execute(
-            "INSERT INTO leave_requests (employee_id, start_date, end_date, reason, status) VALUES (?, ?, ?, ?, 'PENDING')",
-            (employee_id, start_date.isoformat(), end_date.isoformat(), reason)
+    if end_date < start_date:
+        raise ValueError("End date cannot be before start date")
+    req_days = days_inclusive(start_date, end_date)
+    params = {
+        "eid": employee_id,
+        "s": start_date.isoformat(),
+        "e": end_date.isoformat(),
+        "sd": start_date.toordinal(),
+        "ed": end_date.toordinal(),
+        "r": reason,
+        "days": req_days,
+    }
+    with write_tx() as conn:
+        # Validation and insert happen in one statement so concurrent submits cannot
+        # both pass the overlap/balance checks.
+        cur = conn.execute(
+            """
+            INSERT INTO leave_requests (employee_id, start_date, end_date, start_d, end_d, reason, status)
+            SELECT :eid, :s, :e, :sd, :ed, :r, 'PENDING' FROM employees
+            WHERE id = :eid
+              AND joining_d <= :sd
+              AND leave_balance >= :days
+              AND NOT EXISTS (
+                  SELECT 1 FROM leave_requests
+                  WHERE employee_id = :eid
+                    AND status IN ('PENDING','APPROVED')
+                    AND start_d <= :ed
+                    AND end_d >= :sd
+              )
+            """,
+            params
         )
-
-def list_leaves(employee_id: int | None = None, status: str | None = None) -> pd.DataFrame:
-    with closing(get_conn()) as conn:
-        q = "SELECT * FROM leave_requests"
-        params = []
-        clauses = []
-        if employee_id is not None:
-            clauses.append("employee_id = ?")
-            params.append(employee_id)
-        if status:
-            clauses.append("status = ?")
-            params.append(status)
-        if clauses:
-            q += " WHERE " + " AND ".join(clauses)
-        q += " ORDER BY created_at DESC"
-        return pd.read_sql_query(q, conn, params=params)
+        if cur.rowcount == 0:
+            emp = conn.execute("SELECT joining_d FROM employees WHERE id = ?", (employee_id,)).fetchone()
+            if not emp:
+                raise ValueError("Employee not found")
+            if start_date.toordinal() < emp[0]:
+                raise ValueError("Cannot apply for leave before joining date")
+            if has_overlap(conn, employee_id, start_date, end_date):
+                raise ValueError("Overlapping leave request exists (pending or approved)")
+            raise ValueError("Insufficient leave balance")
+    bump_db_version()
+
+@st.cache_data(show_spinner=False, max_entries=LISTING_CACHE_ENTRIES)
+def list_leaves(
+    employee_id: int | None = None, status: str | None = None, ver: int = 0, with_reason: bool = False
+) -> pd.DataFrame:
+    conn = get_read_conn()
+    cols = LEAVE_COLUMNS + (", reason" if with_reason else "")
+    q = f"SELECT {cols} FROM leave_requests"
+    params = []
+    clauses = []
+    if employee_id is not None:
+        clauses.append("employee_id = ?")
+        params.append(employee_id)
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    if clauses:
+        q += " WHERE " + " AND ".join(clauses)
+    q += " ORDER BY created_at DESC"
+    return fetch_df(conn, q, params, LEAVE_DTYPES, chunked=not clauses)
 
 def update_leave_status(leave_id: int, new_status: str):
-    with closing(get_conn()) as conn, conn:
-        cur = conn.execute("SELECT employee_id, start_date, end_date, status FROM leave_requests WHERE id = ?", (leave_id,))
+    with write_tx() as conn:
+        cur = conn.execute(f"SELECT employee_id, {DAYS_EXPR}, status FROM leave_requests WHERE id = ?", (leave_id,))
         row = cur.fetchone()
         if not row:
             raise ValueError("Leave request not found")
-        employee_id = row[0]
-        start_date = date.fromisoformat(row[1])
-        end_date = date.fromisoformat(row[2])
-        curr_status = row[3]
+        employee_id, needed, curr_status = row
         if curr_status != "PENDING":
             raise ValueError("Only pending requests can be updated")
 
+        # Both updates are conditional, so a concurrent approval cannot overdraw the
+        # balance or act on the same request twice; raising rolls the transaction back.
         if new_status == "APPROVED":
-            cur2 = conn.execute("SELECT leave_balance FROM employees WHERE id = ?", (employee_id,))
-            bal = int(cur2.fetchone()[0])
-            needed = days_inclusive(start_date, end_date)
-            if needed > bal:
+            cur = conn.execute(
+                "UPDATE employees SET leave_balance = leave_balance - :needed WHERE id = :eid AND leave_balance >= :needed",
+                {"needed": needed, "eid": employee_id}
+            )
+            if cur.rowcount == 0:
                 raise ValueError("Insufficient balance at approval time")
-            conn.execute("UPDATE employees SET leave_balance = leave_balance - ? WHERE id = ?", (needed, employee_id))
 
-        conn.execute("UPDATE leave_requests SET status = ? WHERE id = ?", (new_status, leave_id))
+        cur = conn.execute(
+            "UPDATE leave_requests SET status = ? WHERE id = ? AND status = 'PENDING'", (new_status, leave_id)
+        )
+        if cur.rowcount == 0:
+            raise ValueError("Only pending requests can be updated")
+    bump_db_version()
+
+def dashboard_counts() -> tuple[int, int, int]:
+    conn = get_read_conn()
+    cur = conn.execute(
+        """
+        SELECT
+            (SELECT COUNT(*) FROM employees),
+            (SELECT COUNT(*) FROM leave_requests WHERE status = 'PENDING'),
+            (SELECT COUNT(*) FROM leave_requests WHERE status = 'APPROVED')
+        """
+    )
+    return tuple(cur.fetchone())
+
+@st.cache_data(show_spinner=False, max_entries=512)
+def _get_balance_cached(emp_id: int, ver: int) -> int | None:
+    conn = get_read_conn()
+    cur = conn.execute("SELECT leave_balance FROM employees WHERE id = ?", (emp_id,))
+    row = cur.fetchone()
+    return int(row[0]) if row else None
 
 def get_balance(emp_id: int) -> int:
-    with closing(get_conn()) as conn:
-        cur = conn.execute("SELECT leave_balance FROM employees WHERE id = ?", (emp_id,))
-        row = cur.fetchone()
-        if not row:
-            raise ValueError("Employee not found")
-        return int(row[0])
+    bal = _get_balance_cached(emp_id, db_version())
+    if bal is None:
+        raise ValueError("Employee not found")
+    return bal
+
+def employee_with_history(emp_id: int) -> tuple[int, pd.DataFrame]:
+    # Both parts are served from the per-version caches, so repeat lookups issue no SQL.
+    return get_balance(emp_id), list_leaves(emp_id, None, db_version())
+
+def db_bytes() -> bytes:
+    # Passed to st.download_button as a callable, so this only runs on click. The
+    # backup API copies a consistent snapshot, WAL contents included, without
+    # racing concurrent writers.
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = os.path.join(tmp, "snapshot.sqlite3")
+        dst = sqlite3.connect(snapshot_path)
+        try:
+            get_read_conn().backup(dst)
+        finally:
+            dst.close()
+        with open(snapshot_path, "rb") as f:
+            return f.read()
 
 # ---------------------- UI ----------------------
-init_db()
+# Date-only columns come back as datetime64; show them without a time part.
+DATE_COLUMN_CONFIG = {
+    c: st.column_config.DateColumn(format="YYYY-MM-DD") for c in ("joining_date", "start_date", "end_date")
+}
+
+ensure_schema()
 st.title("🗓️ Mini Leave Management System")
 
 colA, colB, colC = st.columns(3)
+try:
+    n_employees, n_pending, n_approved = dashboard_counts()
+except Exception:
+    n_employees, n_pending, n_approved = 0, 0, 0
 with colA:
-    try:
-        df_emp = list_employees()
-        st.metric("Employees", len(df_emp))
-    except Exception:
-        st.metric("Employees", 0)
+    st.metric("Employees", n_employees)
 with colB:
-    try:
-        df_pending = list_leaves(status="PENDING")
-        st.metric("Pending Requests", len(df_pending))
-    except Exception:
-        st.metric("Pending Requests", 0)
+    st.metric("Pending Requests", n_pending)
 with colC:
-    try:
-        df_approved = list_leaves(status="APPROVED")
-        st.metric("Approved (All-time)", len(df_approved))
-    except Exception:
-        st.metric("Approved (All-time)", 0)
+    st.metric("Approved (All-time)", n_approved)
 
 st.divider()
 
@@ -220,7 +499,7 @@ with tab_add:
     st.write("")
     st.markdown("#### All Employees")
     q = st.text_input("Search by name or email", key="emp_search")
-    st.dataframe(list_employees(q), use_container_width=True)
+    st.dataframe(list_employees(q, db_version()), use_container_width=True, column_config=DATE_COLUMN_CONFIG)
 
 with tab_apply:
     st.subheader("Apply for Leave")
@@ -235,58 +514,70 @@ with tab_apply:
         submitted2 = st.form_submit_button("Submit Leave Application")
         if submitted2:
             try:
-                apply_leave(int(emp_id), start, end, reason.strip() or None)
+                apply_leave(emp_id, start, end, reason.strip() or None)
                 st.success("Leave application submitted successfully.")
             except Exception as e:
                 st.error(str(e))
 
 with tab_review:
     st.subheader("Pending Leave Requests")
-    df = list_leaves(status="PENDING")
+    df = list_leaves(status="PENDING", ver=db_version(), with_reason=True)
     if df.empty:
         st.info("No pending requests.")
     else:
-        for _, r in df.iterrows():
-            with st.expander(f"Request #{r['id']}  •  Emp {r['employee_id']}  •  {r['start_date']} → {r['end_date']}"):
-                st.write(pd.DataFrame([r]))
-                c1, c2, c3 = st.columns(3)
-                with c1:
-                    if st.button("✅ Approve", key=f"approve_{r['id']}"):
-                        try:
-                            update_leave_status(int(r["id"]), "APPROVED")
-                            st.success("Approved.")
-                        except Exception as e:
-                            st.error(str(e))
-                with c2:
-                    if st.button("❌ Reject", key=f"reject_{r['id']}"):
-                        try:
-                            update_leave_status(int(r["id"]), "REJECTED")
-                            st.success("Rejected.")
-                        except Exception as e:
-                            st.error(str(e))
-                with c3:
-                    st.caption("Requested days: **{}**".format((pd.to_datetime(r['end_date']) - pd.to_datetime(r['start_date'])).days + 1))
+        # The selection is a row position, so key the table on the pending ids: any
+        # change to the list (from this or another session) clears the selection
+        # instead of letting it point at a different request.
+        event = st.dataframe(
+            df, use_container_width=True, hide_index=True, column_config=DATE_COLUMN_CONFIG,
+            on_select="rerun", selection_mode="single-row", key=f"pending_{hash(tuple(df['id']))}"
+        )
+        rows = event.selection.rows
+        if not rows or rows[0] >= len(df):
+            st.caption("Select a request to approve or reject it.")
+        else:
+            r = df.iloc[rows[0]]
+            c1, c2, c3 = st.columns(3)
+            with c1:
+                if st.button("✅ Approve", key=f"approve_{r['id']}"):
+                    try:
+                        update_leave_status(int(r["id"]), "APPROVED")
+                        st.success("Approved.")
+                    except Exception as e:
+                        st.error(str(e))
+            with c2:
+                if st.button("❌ Reject", key=f"reject_{r['id']}"):
+                    try:
+                        update_leave_status(int(r["id"]), "REJECTED")
+                        st.success("Rejected.")
+                    except Exception as e:
+                        st.error(str(e))
+            with c3:
+                st.caption(f"Request #{r['id']}  •  Requested days: **{r['days']}**")
 
     st.markdown("---")
     st.subheader("All Leave Requests (Filter)")
     f1, f2 = st.columns(2)
     with f1:
-        filt_emp = st.text_input("Filter by Employee ID (optional)")
+        filt_emp = st.number_input("Filter by Employee ID (optional)", min_value=1, value=None, step=1)
     with f2:
         filt_status = st.selectbox("Status", ["", "PENDING", "APPROVED", "REJECTED"], index=0)
-    emp_filter = int(filt_emp) if (filt_emp.strip().isdigit()) else None
+    emp_filter = filt_emp
     status_filter = filt_status if filt_status else None
-    st.dataframe(list_leaves(emp_filter, status_filter), use_container_width=True)
+    st.dataframe(
+        list_leaves(emp_filter, status_filter, db_version(), with_reason=True),
+        use_container_width=True, column_config=DATE_COLUMN_CONFIG
+    )
 
 with tab_balance:
     st.subheader("Check Leave Balance & History")
     emp_id2 = st.number_input("Employee ID", min_value=1, step=1, key="bal_emp")
     if st.button("Get Balance & History"):
         try:
-            bal = get_balance(int(emp_id2))
-            st.success(f"Employee {int(emp_id2)} has **{bal}** days remaining.")
+            bal, history = employee_with_history(emp_id2)
+            st.success(f"Employee {emp_id2} has **{bal}** days remaining.")
             st.markdown("#### Leave History")
-            st.dataframe(list_leaves(int(emp_id2), None), use_container_width=True)
+            st.dataframe(history, use_container_width=True, column_config=DATE_COLUMN_CONFIG)
         except Exception as e:
             st.error(str(e))
 
@@ -298,20 +589,31 @@ with tab_admin:
             init_db()
             st.success("Database initialized / migrated.")
     with c2:
-        with closing(get_conn()) as conn:
-            cur = conn.execute("SELECT COUNT(*) FROM employees")
-            n_emp = cur.fetchone()[0]
-            cur = conn.execute("SELECT COUNT(*) FROM leave_requests")
-            n_leave = cur.fetchone()[0]
+        conn = get_read_conn()
+        cur = conn.execute("SELECT COUNT(*) FROM employees")
+        n_emp = cur.fetchone()[0]
+        cur = conn.execute("SELECT COUNT(*) FROM leave_requests")
+        n_leave = cur.fetchone()[0]
         st.metric("Employees", n_emp)
         st.metric("Leave Requests", n_leave)
     with c3:
         st.caption("Download DB")
-        try:
-            with open(DB_PATH, "rb") as f:
-                st.download_button("⬇️ Download SQLite DB", data=f, file_name="leave_mgmt.sqlite3")
-        except FileNotFoundError:
+        if os.path.exists(DB_PATH):
+            st.download_button("⬇️ Download SQLite DB", data=db_bytes, file_name="leave_mgmt.sqlite3")
+        else:
             st.info("DB file not found yet. It will be created automatically once you add data.")
 
+    st.markdown("#### Import Employees (CSV)")
+    st.caption("Columns: name, email, department, joining_date (YYYY-MM-DD), optional leave_balance.")
+    uploaded = st.file_uploader("Import employees CSV", type=["csv"])
+    if uploaded is not None and st.button("Import Employees"):
+        try:
+            n = import_employees(pd.read_csv(uploaded))
+            st.success(f"Imported {n} employee(s).")
+        except sqlite3.IntegrityError:
+            st.error("Import aborted: duplicate or missing values (emails must be unique).")
+        except Exception as e:
+            st.error(str(e))
+
 st.divider()
 st.caption("Made with ❤️ by Ankit Dey :)")